@@ -0,0 +1,72 @@
+import os
+import stat
+import asyncio
+import logging
+from typing import Optional
+
+import diskcache
+
+logger = logging.getLogger(__name__)
+
+
+def default_cache_dir(name: str) -> str:
+    """App-owned location under the user's cache dir (XDG), never a shared temp dir."""
+    base = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "resume-builder", name)
+
+
+def open_private_cache(directory: str, size_limit: int) -> Optional[diskcache.Cache]:
+    """
+    Open a diskcache only the service user can access, or None if unsafe.
+
+    Entries are resume text (PII) stored with pickle, so the directory must be
+    a real directory owned by us that nobody else can write to; otherwise the
+    cache stays disabled. A short SQLite busy timeout makes a contended cache
+    fail fast (callers treat failures as a miss).
+    """
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        st = os.lstat(directory)
+
+        if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+            logger.error("Cache dir %s is not a directory owned by this user; cache disabled", directory)
+            return None
+
+        mode = stat.S_IMODE(st.st_mode)
+        if mode & 0o022:
+            logger.error("Cache dir %s is writable by other users; cache disabled", directory)
+            return None
+        if mode & 0o077:
+            os.chmod(directory, 0o700)
+
+        return diskcache.Cache(directory, size_limit=size_limit, timeout=1)
+
+    except OSError:
+        logger.exception("Could not open cache dir %s; cache disabled", directory)
+        return None
+
+
+async def cache_get(cache: Optional[diskcache.Cache], key: str):
+    """Look `key` up in a worker thread; a disabled cache or any failure is a miss."""
+    if cache is None:
+        return None
+    try:
+        return await asyncio.to_thread(cache.get, key)
+    except Exception:
+        logger.warning("Cache read failed in %s, treating as miss", cache.directory, exc_info=True)
+        return None
+
+
+async def cache_set(cache: Optional[diskcache.Cache], key: str, value, expire: float):
+    """Store `value` in a worker thread; failures are logged, never raised."""
+    if cache is None:
+        return
+    try:
+        await asyncio.to_thread(cache.set, key, value, expire=expire)
+    except Exception:
+        logger.warning("Cache write failed in %s, value not cached", cache.directory, exc_info=True)
+
+
+def close_cache(cache: Optional[diskcache.Cache]):
+    if cache is not None:
+        cache.close()
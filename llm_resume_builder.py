@@ -1,25 +1,86 @@
-import requests
+import httpx
 import json
+import orjson
 import default_schema
-import re
 import os
+import re
+import asyncio
+import hashlib
+import logging
 from dotenv import load_dotenv
+from cache_store import default_cache_dir, open_private_cache, cache_get, cache_set
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 HF_API_KEY = os.getenv("HF_API_KEY")
 
 MODEL_URL = os.getenv("MODEL_URL")
 
+MODEL_NAME = "Qwen/Qwen3-1.7B:featherless-ai"
+
 HEADERS = {
     "Authorization": f"Bearer {HF_API_KEY}",
     "Content-Type": "application/json",
 }
 
+LLM_TIMEOUT_SEC = float(os.getenv("LLM_TIMEOUT_SEC", "120"))
+
+# -----------------------------
+# Pooled async HTTP client (keep-alive → no TLS handshake per LLM call)
+# -----------------------------
+# Opened/closed by the app lifespan, so every startup gets a live client
+_ACLIENT = None
+
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+_MAX_RETRIES = 2
+_RETRY_BACKOFF_SEC = 0.3
+
+
+async def open_http_client():
+    global _ACLIENT
+    if _ACLIENT is None or _ACLIENT.is_closed:
+        _ACLIENT = httpx.AsyncClient(
+            headers=HEADERS,
+            timeout=httpx.Timeout(LLM_TIMEOUT_SEC, connect=5),
+            transport=httpx.AsyncHTTPTransport(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=8),
+                retries=2,  # connect errors only; status retries are in call_hf_api
+            ),
+        )
+
+
+async def close_http_client():
+    global _ACLIENT
+    if _ACLIENT is not None:
+        await _ACLIENT.aclose()
+        _ACLIENT = None
+
+
+# -----------------------------
+# LLM response cache (same PDF text → same schema, no API call)
+# -----------------------------
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", default_cache_dir("llm"))
+LLM_CACHE_TTL_SEC = int(os.getenv("LLM_CACHE_TTL_SEC", str(7 * 86400)))
+
+# Bump whenever the prompt, DEFAULT_SCHEMA or the cleaning rules change, so
+# entries produced by the old pipeline are never served.
+LLM_CACHE_VERSION = 1
+
+# Closed by the app lifespan (main.py)
+LLM_CACHE = open_private_cache(LLM_CACHE_DIR, size_limit=int(2e9)) if LLM_CACHE_ENABLED else None
+
+
+def _cache_key(pdf_text: str) -> str:
+    return hashlib.sha256(f"v{LLM_CACHE_VERSION}\n{MODEL_NAME}\n{pdf_text}".encode("utf-8")).hexdigest()
+
 
-def call_hf_api(prompt: str) -> str:
+async def call_hf_api(prompt: str) -> str:
     payload = {
-        "model": "Qwen/Qwen3-1.7B:featherless-ai",
+        "model": MODEL_NAME,
 
         "messages": [
             {
@@ -40,8 +101,17 @@ def call_hf_api(prompt: str) -> str:
         "temperature": 0.0,
     }
 
-    response = requests.post(MODEL_URL, headers=HEADERS, json=payload)
-    result = response.json()
+    # Outside the app lifespan (scripts, tests) open the client lazily
+    if _ACLIENT is None:
+        await open_http_client()
+
+    for attempt in range(_MAX_RETRIES + 1):
+        response = await _ACLIENT.post(MODEL_URL, json=payload)
+        if response.status_code not in _RETRY_STATUSES or attempt == _MAX_RETRIES:
+            break
+        await asyncio.sleep(_RETRY_BACKOFF_SEC * (2 ** attempt))
+
+    result = orjson.loads(response.content)
 
     # print("\n--- HF RAW RESPONSE ---\n", result, "\n------------------------\n")
 
@@ -81,36 +151,57 @@ def call_hf_api(prompt: str) -> str:
 #     return json.loads(json_str)
 
 
+# Escape pairs and string literals, matched by the C regex engine.
+# An unterminated literal (only possible at the end) keeps its opening
+# quote through the \1 replacement; everything else is removed.
+_RE_JSON_SKIP = re.compile(
+    r'\\.'                              # escape pair outside a string
+    r'|"[^"\\]*(?:\\.[^"\\]*)*"'          # closed string literal
+    r'|(")[^"\\]*(?:\\.[^"\\]*)*',        # unterminated string literal
+    re.DOTALL
+)
+
+
+def _scan_json_tokens(raw: str):
+    """
+    Count the braces/brackets that sit OUTSIDE string literals and
+    report whether the output ends inside an unterminated string.
+    One regex pass strips strings/escapes, the counts run on what is left.
+    """
+    structure = _RE_JSON_SKIP.sub(r"\1", raw)
+
+    return (
+        structure.count("{"),
+        structure.count("}"),
+        structure.count("["),
+        structure.count("]"),
+        '"' in structure,
+    )
+
+
 def safe_json_extract(text: str):
     raw = text.rstrip()
 
+    opens_curly, closes_curly, opens_square, closes_square, unterminated = _scan_json_tokens(raw)
+
     # STEP 1 — Fix unterminated string
-    unescaped_quotes = len(re.findall(r'(?<!\\)"', raw))
-    if unescaped_quotes % 2 == 1:
+    if unterminated:
         raw += '"'
 
     # STEP 2 — Now close object + array + root
     # This exact ordering matches your working manual fix
     fix = ""
 
-    opens_curly = raw.count("{")
-    closes_curly = raw.count("}")
-
-    opens_square = raw.count("[")
-    closes_square = raw.count("]")
-
     # Close one object if needed
     if closes_curly < opens_curly:
         fix += "}"
+        closes_curly += 1
 
     # Close one array if needed
     if closes_square < opens_square:
         fix += "]"
 
     # Close final root object if still unbalanced
-    opens_curly = raw.count("{")
-    closes_curly = raw.count("}") + fix.count("}")
-
     if closes_curly < opens_curly:
         fix += "}"
 
@@ -118,41 +209,68 @@ def safe_json_extract(text: str):
 
     # STEP 3 — Parse
     try:
-        return json.loads(raw)
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # orjson is stricter than stdlib: lone surrogates (emoji cut
+            # mid-pair by truncation) and NaN/Infinity still parse here
+            return json.loads(raw)
     except Exception as e:
         print("FAILED AGAIN:", e)
         print("RAW END:\n", raw[-500:])
         return {}
 
 
-def sanitize_value(key, value):
-    """Field-specific cleanup logic."""
+# --- Fix percentile like "96%" → "96"
+def _fix_score(value):
+    return value.replace("%", "").strip() if isinstance(value, str) else value
 
-    # --- Fix percentile like "96%" → "96"
-    if key == "score" and isinstance(value, str):
-        return value.replace("%", "").strip()
 
-    # --- Fix ISO date "2022-08" → "2022-08-01"
-    if key in ("startDate", "endDate", "issueDate") and isinstance(value, str):
-        if len(value) == 7:  # "YYYY-MM"
-            return value + "-01"
-        return value
+# --- Fix ISO date "2022-08" → "2022-08-01"
+def _fix_iso_date(value):
+    if isinstance(value, str) and len(value) == 7:  # "YYYY-MM"
+        return value + "-01"
+    return value
 
-    # --- Fix wrong list types
-    if key in ("socials", "links") and not isinstance(value, list):
-        return []
 
-    # --- skillName must be string
-    if key == "skillName":
-        return value if isinstance(value, str) else ""
+# --- Fix wrong list types
+def _fix_list(value):
+    return value if isinstance(value, list) else []
+
+
+# --- skillName must be string
+def _fix_string(value):
+    return value if isinstance(value, str) else ""
+
+
+# Field key → cleanup handler (one dict lookup per leaf)
+_SANITIZERS = {
+    "score": _fix_score,
+    "startDate": _fix_iso_date,
+    "endDate": _fix_iso_date,
+    "issueDate": _fix_iso_date,
+    "socials": _fix_list,
+    "links": _fix_list,
+    "skillName": _fix_string,
+}
+
+
+def sanitize_value(key, value):
+    """Field-specific cleanup logic."""
+    handler = _SANITIZERS.get(key)
+    return handler(value) if handler else value
 
-    return value
 
+_EMPTY_VALUES = ("", None, [], {})
 
-def enforce_schema_format(data, schema, current_key=None):
+
+def enforce_and_clean(data, schema, current_key=None):
     """
-    Recursively enforces `data` to match EXACT shape of `schema`.
-    Applies sanitization with the CORRECT field key.
+    Recursively enforces `data` to match EXACT shape of `schema`
+    and cleans it in the same walk:
+    - applies sanitization with the CORRECT field key
+    - trims strings
+    - drops "", [], {} and None values
     """
 
     # ---------------------------
@@ -169,24 +287,27 @@ def enforce_schema_format(data, schema, current_key=None):
         for key, schema_value in schema.items():
 
             if key not in data:
-                result[key] = schema_value
-                continue
-
-            raw_value = data[key]
+                cleaned = deep_clean(schema_value)
 
             # Primitive type → sanitize
-            if not isinstance(schema_value, (dict, list)):
-                cleaned = sanitize_value(key, raw_value)
+            elif not isinstance(schema_value, (dict, list)):
+                cleaned = sanitize_value(key, data[key])
 
                 # Wrong primitive type → fallback to default
                 if schema_value is not None and type(cleaned) != type(schema_value):
                     cleaned = schema_value
 
-                result[key] = cleaned
-                continue
+                cleaned = deep_clean(cleaned)
 
             # RECURSE for nested object/list
-            result[key] = enforce_schema_format(raw_value, schema_value, current_key=key)
+            else:
+                cleaned = enforce_and_clean(data[key], schema_value, current_key=key)
+
+            # Skip empty, null, blank
+            if cleaned in _EMPTY_VALUES:
+                continue
+
+            result[key] = cleaned
 
         return result
 
@@ -200,16 +321,16 @@ def enforce_schema_format(data, schema, current_key=None):
             return []
 
         if len(schema) == 0:
-            return [item for item in data if isinstance(item, (dict, str))]
-
-        item_schema = schema[0]
-
-        cleaned_items = []
-        for item in data:
-            if isinstance(item, dict):
-                cleaned_items.append(enforce_schema_format(item, item_schema))
+            cleaned_items = [deep_clean(item) for item in data if isinstance(item, (dict, str))]
+        else:
+            item_schema = schema[0]
+            cleaned_items = [
+                enforce_and_clean(item, item_schema)
+                for item in data
+                if isinstance(item, dict)
+            ]
 
-        return cleaned_items
+        return [item for item in cleaned_items if item not in _EMPTY_VALUES]
 
 
     # ---------------------------
@@ -221,9 +342,9 @@ def enforce_schema_format(data, schema, current_key=None):
 
         # Type mismatch → use default
         if schema is not None and type(cleaned) != type(schema):
-            return schema
+            cleaned = schema
 
-        return cleaned
+        return deep_clean(cleaned)
 
 
 def deep_clean(obj):
@@ -242,7 +363,7 @@ def deep_clean(obj):
             cleaned_value = deep_clean(v)
 
             # Skip empty, null, blank
-            if cleaned_value in ("", None, [], {}):
+            if cleaned_value in _EMPTY_VALUES:
                 continue
 
             cleaned[k] = cleaned_value
@@ -252,7 +373,7 @@ def deep_clean(obj):
     # --- Case 2: List ---
     if isinstance(obj, list):
         cleaned_list = [deep_clean(i) for i in obj]
-        cleaned_list = [i for i in cleaned_list if i not in ("", None, [], {})]
+        cleaned_list = [i for i in cleaned_list if i not in _EMPTY_VALUES]
 
         return cleaned_list
 
@@ -264,7 +385,24 @@ def deep_clean(obj):
     return obj
 
 
-def generate_resume_schema(pdf_text):
+def normalize_llm_output(output: str) -> dict:
+    """
+    Whole post-LLM stage in one call:
+    raw model text → repaired + parsed JSON → DEFAULT_SCHEMA shape, no empties.
+    """
+    raw = safe_json_extract(output)
+
+    # Enforce schema, fix any missing/wrong fields & drop empties
+    return enforce_and_clean(raw, default_schema.DEFAULT_SCHEMA)
+
+
+async def generate_resume_schema(pdf_text):
+    key = _cache_key(pdf_text)
+    hit = await cache_get(LLM_CACHE, key)
+    if hit is not None:
+        return hit
+
+    # Editing this prompt? Bump LLM_CACHE_VERSION.
     prompt = f"""
 You MUST output ONLY valid JSON.  
 NO text. NO explanation. NO markdown. NO tags.  
@@ -365,20 +503,16 @@ PDF DATA:
 Return ONLY the JSON object. NOTHING else.
 """
 
-    output = call_hf_api(prompt)
+    output = await call_hf_api(prompt)
     # print("=======output======\n\n")
     # print(output)
     
 
-    raw = safe_json_extract(output)
-
-    # print("=======raw======\n\n")
-    # print(raw)
-    
-    # Enforce schema & fix any missing/wrong fields
-    normalized = enforce_schema_format(raw, default_schema.DEFAULT_SCHEMA)
+    cleaned = normalize_llm_output(output)
 
-    cleaned = deep_clean(normalized)
+    # Don't cache failed generations
+    if cleaned:
+        await cache_set(LLM_CACHE, key, cleaned, expire=LLM_CACHE_TTL_SEC)
 
     return cleaned
     
@@ -390,6 +524,6 @@ Return ONLY the JSON object. NOTHING else.
     # print('==================================')
     # print(raw)
 
-    # normalized = enforce_schema_format(raw, default_schema.DEFAULT_SCHEMA)
+    # normalized = enforce_and_clean(raw, default_schema.DEFAULT_SCHEMA)
 
     # return normalized
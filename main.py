@@ -1,13 +1,16 @@
 import os
-import io
 import asyncio
 import logging
+import hashlib
+import anyio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, UploadFile, HTTPException, Header
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pdf_processor import extract_text_from_pdf
-from llm_resume_builder import generate_resume_schema
-from schema import ResumeResponse
+from llm_resume_builder import generate_resume_schema, open_http_client, close_http_client, LLM_CACHE
+from schema import RESUME_ADAPTER
+from cache_store import default_cache_dir, open_private_cache, cache_get, cache_set, close_cache
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -17,14 +20,19 @@ load_dotenv()
 # -----------------------------
 MAX_FILE_SIZE_MB = float(os.getenv("MAX_FILE_SIZE_MB", "5"))         # e.g. 5 MB
 MAX_FILE_SIZE = int(MAX_FILE_SIZE_MB * 1024 * 1024)
+READ_CHUNK_SIZE = 64 * 1024
 LLM_TIMEOUT_SEC = float(os.getenv("LLM_TIMEOUT_SEC", "120"))          # 120 seconds
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "*")
 INTERNAL_SECRET = os.getenv("EXPRESS_INTERNAL_SECRET")
+PDF_CACHE_ENABLED = os.getenv("PDF_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", default_cache_dir("pdf_text"))
+PDF_CACHE_TTL_SEC = int(os.getenv("PDF_CACHE_TTL_SEC", "86400"))       # 1 day
 
 print("=== ENVIRONMENT CHECK ===")
 print("MAX_FILE_SIZE_MB:", MAX_FILE_SIZE_MB)
 print("MAX_FILE_SIZE:", MAX_FILE_SIZE)
 print("LLM_TIMEOUT_SEC:", LLM_TIMEOUT_SEC)
+print("PDF_CACHE_ENABLED:", PDF_CACHE_ENABLED)
 print("================================")
 
 # -----------------------------
@@ -36,12 +44,29 @@ logging.basicConfig(
 )
 logger = logging.getLogger("resume-api")
 
+# -----------------------------
+# Extracted-text cache (re-uploads of the same PDF skip extraction)
+# -----------------------------
+_PDF_CACHE = open_private_cache(PDF_CACHE_DIR, size_limit=int(300e6)) if PDF_CACHE_ENABLED else None
+
 # -----------------------------
 # App + CORS
 # -----------------------------
 ENV = os.getenv("ENVIRONMENT", "dev")
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await open_http_client()
+    yield
+    await close_http_client()
+    close_cache(LLM_CACHE)
+    close_cache(_PDF_CACHE)
+
+
 app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url=None if ENV == "prod" else "/docs",
     redoc_url=None if ENV == "prod" else "/redoc",
     openapi_url=None if ENV == "prod" else "/openapi.json"
@@ -71,13 +96,12 @@ else:
 # -----------------------------
 async def _run_llm_with_timeout(pdf_text: str):
     """
-    Your generate_resume_schema is synchronous. We run it in a worker thread
-    and enforce an async timeout.
+    generate_resume_schema is async (httpx), so it runs on the event loop
+    directly; we only enforce an async timeout.
     """
-    import anyio
     try:
         return await asyncio.wait_for(
-            anyio.to_thread.run_sync(generate_resume_schema, pdf_text),
+            generate_resume_schema(pdf_text),
             timeout=LLM_TIMEOUT_SEC
         )
     except asyncio.TimeoutError:
@@ -121,18 +145,28 @@ async def process_resume(pdf: UploadFile, secret: str = Header(None)):
 
     # 2) Read bytes to check size & hand off safely
     try:
-        file_bytes = await pdf.read()
-        size = len(file_bytes or b"")
+        too_large = HTTPException(
+            status_code=413,
+            detail=f"PDF file too large (>{MAX_FILE_SIZE_MB:.0f} MB)"
+        )
+
+        # Size known from the multipart parser → reject without reading
+        if pdf.size is not None and pdf.size > MAX_FILE_SIZE:
+            raise too_large
+
+        # Bounded chunked read: stop as soon as the limit is crossed
+        chunks = []
+        size = 0
+        while chunk := await pdf.read(READ_CHUNK_SIZE):
+            size += len(chunk)
+            if size > MAX_FILE_SIZE:
+                raise too_large
+            chunks.append(chunk)
+
         if size == 0:
             raise HTTPException(status_code=422, detail="Empty PDF uploaded")
 
-        if size > MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=413,
-                detail=f"PDF file too large (>{MAX_FILE_SIZE_MB:.0f} MB)"
-            )
-
-        file_like = io.BytesIO(file_bytes)
+        file_bytes = b"".join(chunks)
 
     except HTTPException:
         raise
@@ -145,7 +179,14 @@ async def process_resume(pdf: UploadFile, secret: str = Header(None)):
 
     # 3) Extract PDF text
     try:
-        pdf_text = extract_text_from_pdf(file_like)
+        # Content-addressed: same upload bytes → same text
+        cache_key = hashlib.blake2b(file_bytes, digest_size=16).hexdigest()
+        pdf_text = await cache_get(_PDF_CACHE, cache_key)
+
+        if pdf_text is None:
+            # Native extraction + regex cleanup: keep it off the event loop
+            pdf_text = await anyio.to_thread.run_sync(extract_text_from_pdf, file_bytes)
+            await cache_set(_PDF_CACHE, cache_key, pdf_text, expire=PDF_CACHE_TTL_SEC)
 
         if not pdf_text or len(pdf_text.strip()) < 10:
             raise HTTPException(
@@ -183,8 +224,8 @@ async def process_resume(pdf: UploadFile, secret: str = Header(None)):
 
     # 5) Pydantic validation (drop None automatically)
     try:
-        validated = ResumeResponse(**normalized)
-        final_output = validated.model_dump(exclude_none=True)
+        validated = RESUME_ADAPTER.validate_python(normalized)
+        final_output = RESUME_ADAPTER.dump_python(validated, exclude_none=True)
 
         # If you also want to drop empty lists/objects/empty-strings here,
         # you can run a small normalizer (optional). Keeping as-is per your current logic.
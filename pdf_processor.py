@@ -1,6 +1,11 @@
+import io
 import re
-import pdfplumber
-from typing import Dict, List, Tuple
+import logging
+import threading
+import pypdfium2 as pdfium
+from typing import Dict, List, Tuple, Union
+
+logger = logging.getLogger(__name__)
 
 
 # ========================================
@@ -20,31 +25,39 @@ def strip_bad_chars(text: str) -> str:
 # ========================================
 # 1) CLEAN BASIC PDF ARTIFACTS
 # ========================================
-def clean_text(text: str) -> str:
-    replacements = {
-        "\u201c": '"', "\u201d": '"',
-        "\u2018": "'", "\u2019": "'",
-        "\u2014": "-", "\u2013": "-",
-        "\u00a0": " ", "\u200b": "", "\ufeff": "",
-    }
-    for k, v in replacements.items():
-        text = text.replace(k, v)
-
+_BULLET_CHARS = "•●▪◦·■□★◆►▶"
+
+# Single-character fixes, applied in one str.translate pass
+_TRANS = str.maketrans({
+    "\u201c": '"', "\u201d": '"',
+    "\u2018": "'", "\u2019": "'",
+    "\u2014": "-", "\u2013": "-",
+    "\u00a0": " ", "\u200b": None, "\ufeff": None,
     # Replace weird bullets
-    text = re.sub(r"[•●▪◦·■□★◆►▶]", " ", text)
+    **{c: " " for c in _BULLET_CHARS},
+})
+
+_RE_DOTDOMAIN = re.compile(r"(?i)\b([A-Za-z0-9\-]+)\s*\.\s*([A-Za-z0-9\-]+)\b")
+_RE_HTTPSPACE = re.compile(r"(https?://)\s+")
+_RE_SLASHSPACE = re.compile(r"/\s+([A-Za-z0-9])")
+_RE_WS = re.compile(r"[ \t]+")
+_RE_NL = re.compile(r"\s*\n\s*")
+
+def clean_text(text: str) -> str:
+    text = text.translate(_TRANS)
 
     # Fix “linkedin . com”
-    text = re.sub(r"(?i)\b([A-Za-z0-9\-]+)\s*\.\s*([A-Za-z0-9\-]+)\b", r"\1.\2", text)
+    text = _RE_DOTDOMAIN.sub(r"\1.\2", text)
 
     # Fix “https:// github”
-    text = re.sub(r"(https?://)\s+", r"\1", text)
+    text = _RE_HTTPSPACE.sub(r"\1", text)
 
     # Fix “/ username”
-    text = re.sub(r"/\s+([A-Za-z0-9])", r"/\1", text)
+    text = _RE_SLASHSPACE.sub(r"/\1", text)
 
     # Normalize spaces and newlines
-    text = re.sub(r"[ \t]+", " ", text)
-    text = re.sub(r"\s*\n\s*", "\n", text)
+    text = _RE_WS.sub(" ", text)
+    text = _RE_NL.sub("\n", text)
     return text.strip()
 
 
@@ -58,96 +71,138 @@ HEADING_TOKENS = [
     "Certifications", "Publications"
 ]
 
+def _trie_pattern(words: List[str]) -> str:
+    """
+    Build a prefix-factored alternation from literal words, e.g.
+    ["Awards", "Achievements"] → "A(?:chievements|wards)".
+    The regex engine then follows one branch per character instead of
+    retrying every heading at every position of the text.
+    """
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}  # end of word
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            body = f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+
+_HEADINGS_ALT = _trie_pattern(HEADING_TOKENS)
+
+_RE_DEGLUE_NEXT = re.compile(rf"(?i)\b({_HEADINGS_ALT})(?=[A-Z0-9])")
+_RE_DEGLUE_PREV = re.compile(rf"(?i)(?<!\n)\b({_HEADINGS_ALT})\b")
+_RE_DEGLUE_JUNK = re.compile(rf"(?i)\b({_HEADINGS_ALT})\s*[:/\\\-]?\s*")
+_RE_BLANK_LINES = re.compile(r"\n{3,}")
+
+# (?a:...) keeps case-folding ASCII-only, so every match casefolds to a
+# _NORMALIZE_HEADING key (plain IGNORECASE also matches "ı", "İ", "ſ", "K")
+_RE_SPLIT_SECTIONS = re.compile(rf"\b((?a:{_HEADINGS_ALT}))\b", re.IGNORECASE)
+
 
 # ========================================
 # 3) FIX GLUED HEADINGS
 # Example: "...coderEducationRCC" → "...coder\nEducation\nRCC"
 # ========================================
 def deglue_headings(text: str) -> str:
-    headings = "|".join(re.escape(h) for h in HEADING_TOKENS)
-
     # Case 1 — Heading glued to next capital/number
-    text = re.sub(
-        rf"(?i)\b({headings})(?=[A-Z0-9])",
-        r"\1\n",
-        text
-    )
+    text = _RE_DEGLUE_NEXT.sub(r"\1\n", text)
 
     # Case 2 — Heading glued to previous token
-    text = re.sub(
-        rf"(?i)(?<!\n)\b({headings})\b",
-        r"\n\1",
-        text
-    )
+    text = _RE_DEGLUE_PREV.sub(r"\n\1", text)
 
     # Case 3 — Remove junk like "Skills:" or "Honors /"
-    text = re.sub(
-        rf"(?i)\b({headings})\s*[:/\\\-]?\s*",
-        r"\1\n",
-        text
-    )
+    text = _RE_DEGLUE_JUNK.sub(r"\1\n", text)
 
-    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = _RE_BLANK_LINES.sub("\n\n", text)
     return text
 
 
 # ========================================
 # 4) SPLIT INTO SECTIONS
 # ========================================
-def split_sections(text: str) -> Dict[str, str]:
-    pattern = "(" + "|".join(fr"\b{h}\b" for h in HEADING_TOKENS) + ")"
-    parts = re.split(pattern, text, flags=re.IGNORECASE)
+# Matched heading (casefolded) → canonical section name
+_NORMALIZE_HEADING = {
+    "education": "Education",
+    "experience": "Experience",
+    "work experience": "Experience",
+    "projects": "Projects",
+    "skills": "Skills",
+    "technical skills": "Skills",
+    "honors": "Honors",
+    "awards": "Honors",
+    "achievements": "Honors",
+    "certifications": "Certifications",
+    "publications": "Publications",
+}
 
-    if not parts:
-        return {"Body": text}
 
-    sections = {}
+def split_sections(text: str) -> Dict[str, str]:
+    matches = list(_RE_SPLIT_SECTIONS.finditer(text))
+
+    sections: Dict[str, List[str]] = {}
 
     # Header = text before 1st heading
-    if parts[0].strip():
-        sections["Header"] = parts[0].strip()
-
-    # Process sections
-    for i in range(1, len(parts), 2):
-        heading = parts[i].strip().title()
-        content = parts[i + 1].strip() if i + 1 < len(parts) else ""
-
-        # Normalize
-        if "Experience" in heading:
-            heading = "Experience"
-        elif "Education" in heading:
-            heading = "Education"
-        elif "Project" in heading:
-            heading = "Projects"
-        elif "Skill" in heading:
-            heading = "Skills"
-        elif any(x in heading for x in ["Honor", "Award", "Achievement"]):
-            heading = "Honors"
-        elif "Certification" in heading:
-            heading = "Certifications"
-        elif "Publication" in heading:
-            heading = "Publications"
-
-        if heading in sections:
-            sections[heading] += "\n" + content
-        else:
-            sections[heading] = content
-
-    return sections
+    head = text[:matches[0].start()] if matches else text
+    if head.strip():
+        sections["Header"] = [head.strip()]
+
+    # Process sections: body runs until the next heading
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        content = text[m.end():end].strip()
+
+        heading = _NORMALIZE_HEADING[m.group(1).casefold()]
+
+        sections.setdefault(heading, []).append(content)
+
+    return {k: "\n".join(v) for k, v in sections.items()}
 
 
 # ========================================
 # 5) TRIMMING HELPERS
 # ========================================
-def limit_lines(block: str, max_lines: int) -> str:
-    lines = [l.strip() for l in block.split("\n") if l.strip()]
-    return "\n".join(lines[:max_lines])
-
-
-def limit_sentences(block: str, max_items: int) -> str:
-    parts = re.split(r"(?<=[.!?])\s+", block)
-    parts = [p.strip() for p in parts if p.strip()]
-    return " ".join(parts[:max_items])
+_RE_SENT_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+def limit_block(block: str, max_lines: int, max_sentences: int) -> str:
+    """
+    First `max_lines` non-empty lines, then first `max_sentences` sentences
+    of those. Both loops stop as soon as their limit is reached.
+    """
+    lines = []
+    for line in block.split("\n"):
+        if len(lines) >= max_lines:
+            break
+        line = line.strip()
+        if line:
+            lines.append(line)
+
+    text = "\n".join(lines)
+
+    sentences = []
+    start = 0
+    for sep in _RE_SENT_SPLIT.finditer(text):
+        if len(sentences) >= max_sentences:
+            break
+        part = text[start:sep.start()].strip()
+        if part:
+            sentences.append(part)
+        start = sep.end()
+    else:
+        part = text[start:].strip()
+        if part and len(sentences) < max_sentences:
+            sentences.append(part)
+
+    return " ".join(sentences)
 
 
 # ========================================
@@ -175,7 +230,7 @@ SECTION_PRIORITY = [
 # ========================================
 def shorten_sections(sections: Dict[str, str], max_chars=6000) -> str:
     used = set()
-    blocks = []
+    buf = io.StringIO()
 
     # Priority pass
     for key in SECTION_PRIORITY:
@@ -186,20 +241,23 @@ def shorten_sections(sections: Dict[str, str], max_chars=6000) -> str:
         block = sections[key]
         max_lines, max_sent = SECTION_LIMITS[key]
 
-        block = limit_lines(block, max_lines)
-        block = limit_sentences(block, max_sent)
+        block = limit_block(block, max_lines, max_sent)
 
         if key != "Header":
-            block = f"{key}:\n{block}"
-
-        blocks.append(block)
+            buf.write(key)
+            buf.write(":\n")
+        buf.write(block)
+        buf.write("\n\n")
 
     # Add unknown leftover sections
     for key, val in sections.items():
         if key not in used and val.strip():
-            blocks.append(f"{key}:\n{val.strip()}")
+            buf.write(key)
+            buf.write(":\n")
+            buf.write(val.strip())
+            buf.write("\n\n")
 
-    final = "\n\n".join(blocks).strip()
+    final = buf.getvalue().strip()
 
     # Hard cap
     if len(final) > max_chars:
@@ -214,11 +272,30 @@ def shorten_sections(sections: Dict[str, str], max_chars=6000) -> str:
 # ========================================
 # 8) MAIN ENTRYPOINT
 # ========================================
-def extract_text_from_pdf(file_path: str) -> str:
+# PDFium is not thread-safe (not even across documents), so pages can't be
+# extracted in parallel. Callers run extraction in worker threads instead
+# and this lock serializes the native part; text cleanup runs outside it.
+_PDFIUM_LOCK = threading.Lock()
+
+
+def _extract_pages(source: Union[str, bytes]) -> List[str]:
     raw_pages = []
-    with pdfplumber.open(file_path) as pdf:
-        for page in pdf.pages:
-            raw_pages.append(page.extract_text() or "")
+    with _PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(source)
+        try:
+            for page in pdf:
+                textpage = page.get_textpage()
+                raw_pages.append(textpage.get_text_range() or "")
+                textpage.close()
+                page.close()
+        finally:
+            pdf.close()
+    return raw_pages
+
+
+def extract_text_from_pdf(source: Union[str, bytes]) -> str:
+    # A file path or the raw PDF bytes (main.py passes the upload bytes)
+    raw_pages = _extract_pages(source)
 
     text = "\n".join(raw_pages)
 
@@ -229,5 +306,5 @@ def extract_text_from_pdf(file_path: str) -> str:
     sections = split_sections(text)
     final = shorten_sections(sections, max_chars=6000)
 
-    print(final)
+    logger.debug("extracted %d chars from %d pages", len(final), len(raw_pages))
     return final
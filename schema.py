@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 from typing import List, Optional
 
 
@@ -71,10 +71,12 @@ class CertificationItem(BaseModel):
 
 
 class ResumeResponse(BaseModel):
-    model_config = {
-        "extra": "ignore",
-        "exclude_none": True     # ✅ important
-    }
+    # None-dropping happens at dump time (exclude_none=True in the route)
+    model_config = ConfigDict(
+        extra="ignore",
+        defer_build=False,
+        validate_assignment=False,
+    )
 
     resumeTitle: Optional[str] = None
     resumeType: Optional[str] = None
@@ -85,3 +87,7 @@ class ResumeResponse(BaseModel):
     projects: Optional[List[ProjectItem]] = None
     otherExperience: Optional[List[ExperienceItem]] = None
     certifications: Optional[List[CertificationItem]] = None
+
+
+# Built once at import: validate + dump through the compiled core schema
+RESUME_ADAPTER = TypeAdapter(ResumeResponse)